@@ -1,14 +1,17 @@
 # app.py — Action Planner (text-friendly UI + Run All + Deliver)
 
-import os, json, io, zipfile, datetime as dt
+import os, json, io, time, zipfile, datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from schemas import PlanOut, ResearchOut, AssetsOut, Milestone
-from planner_groq import make_plan
-from researcher_groq import make_research
-from producer_groq import make_assets
+from langchain_core.utils.json import parse_json_markdown
+from schemas import PlanOut, AssetsOut, Milestone
+from planner_groq import make_plan, cached_plan, stream_plan, finish_plan
+from researcher_groq import make_research, cached_research, stream_research, finish_research
+from producer_groq import make_assets, cached_assets, stream_assets, finish_assets
+from groq_client import current_model
 
 # ---- Optional email/calendar helpers ----
-import ssl, smtplib
+import re, ssl, smtplib
 from email.message import EmailMessage
 from urllib.parse import quote
 
@@ -37,7 +40,7 @@ st.markdown("""
 # ---------- Sidebar ----------
 with st.sidebar:
     st.header("Model")
-    current = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
+    current = current_model()
     chosen = st.text_input(
         "Groq model",
         current,
@@ -75,6 +78,9 @@ st.session_state.setdefault("research", None)
 st.session_state.setdefault("plan", None)
 st.session_state.setdefault("assets", None)
 st.session_state.setdefault("edit_mode", False)
+st.session_state.setdefault("run_all_futures", None)
+st.session_state.setdefault("assets_generated_at", None)
+st.session_state.setdefault("launch_pack_bytes", None)
 
 # ---------- Render helpers (text-friendly) ----------
 def render_targets(targets):
@@ -117,11 +123,44 @@ def render_references(refs):
 
 
 def render_tasks_table(tasks):
-    rows = []
-    for t in tasks:
-        d = t.model_dump() if hasattr(t, "model_dump") else t
-        rows.append({"Task": d.get("desc",""), "Owner": d.get("owner","You"), "Effort (hrs)": d.get("effort_hrs","")})
-    st.table(rows)
+    # column-wise dict of lists: plain attribute reads, no per-row model_dump()
+    st.table({
+        "Task": [t.desc for t in tasks],
+        "Owner": [t.owner for t in tasks],
+        "Effort (hrs)": [t.effort_hrs for t in tasks],
+    })
+
+def preview_milestones(partial):
+    for m in partial.get("milestones") or []:
+        if isinstance(m, dict):
+            st.markdown(f"- {m.get('title', '…')} — due {m.get('due', '…')}")
+
+PREVIEW_INTERVAL_S = 0.25
+
+def stream_json(chunks, preview):
+    """Show raw JSON as it streams plus a live preview of the partial object; return the full text."""
+    live = st.empty()
+    def tee():
+        parts, last = [], 0.0
+        for chunk in chunks:
+            parts.append(chunk)
+            # re-parsing the whole prefix per token is quadratic: only do it when a
+            # value may have closed, and at most a few times per second
+            now = time.monotonic()
+            if ("}" in chunk or "]" in chunk) and now - last >= PREVIEW_INTERVAL_S:
+                last = now
+                try:
+                    partial = parse_json_markdown("".join(parts))   # tolerates unclosed braces/fences
+                except ValueError:
+                    partial = None
+                if isinstance(partial, dict):
+                    with live.container():
+                        preview(partial)
+            yield chunk
+    with st.expander("Raw model output", expanded=False):
+        text = st.write_stream(tee())
+    live.empty()
+    return text
 
 def timeline():
     def badge(ok, label): return f"{'✅' if ok else '⏳'} {label}"
@@ -142,35 +181,98 @@ def build_eml_bytes(subject: str, body: str, sender: str, recipient: str) -> byt
     msg.set_content(body)
     return msg.as_bytes()
 
-def smtp_send(subject: str, body: str, sender: str, recipient: str) -> tuple[bool, str]:
-    host = os.getenv("SMTP_HOST", st.secrets.get("SMTP_HOST", ""))
-    port = int(os.getenv("SMTP_PORT", st.secrets.get("SMTP_PORT", "0") or "0"))
-    user = os.getenv("SMTP_USER", st.secrets.get("SMTP_USER", ""))
-    pw   = os.getenv("SMTP_PASS", st.secrets.get("SMTP_PASS", ""))
+# .match() already anchors at the start; \Z (not $) rejects a trailing newline
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+\Z")
+
+def valid_email(x: str) -> bool:
+    return bool(_EMAIL_RE.match(x)) if x else False
+
+def _smtp_port() -> int:
+    # a bad SMTP_PORT must not break every Deliver render; 0 reads as "not configured"
+    try:
+        return int(os.getenv("SMTP_PORT") or st.secrets.get("SMTP_PORT", 0) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+@st.cache_resource(show_spinner=False)
+def smtp_cfg() -> dict:
+    """SMTP settings from env, falling back to secrets; read once per process."""
+    return {
+        "host": os.getenv("SMTP_HOST", st.secrets.get("SMTP_HOST", "")),
+        "port": _smtp_port(),
+        "user": os.getenv("SMTP_USER", st.secrets.get("SMTP_USER", "")),
+        "pw":   os.getenv("SMTP_PASS", st.secrets.get("SMTP_PASS", "")),
+    }
+
+def smtp_send(cfg: dict, subject: str, body: str, sender: str, recipient: str) -> tuple[bool, str]:
+    host, port, user, pw = cfg["host"], cfg["port"], cfg["user"], cfg["pw"]
     if not all([host, port, user, pw]):
-        return False, "SMTP not configured"
+        return False, "SMTP not configured in secrets."
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = sender or user
     msg["To"] = recipient
     msg.set_content(body)
     try:
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL(host, port, context=context) as server:
+        with smtplib.SMTP_SSL(host, port, context=ssl.create_default_context()) as server:
             server.login(user, pw)
             server.send_message(msg)
-        return True, "Sent"
+        return True, "Email sent ✅"
     except Exception as e:
-        return False, str(e)
+        return False, f"Send failed: {e}"
+
+def utc_stamp() -> str:
+    return dt.datetime.now(dt.UTC).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+@st.cache_data(show_spinner=False)
+def build_pack_zip(plan_json: str, research_json: str | None, assets: dict, generated_at: str) -> bytes:
+    # entries are stamped with generated_at (not "now") so identical inputs give identical bytes;
+    # level 1 is several times faster than the default and markdown/JSON still shrink well
+    stamp = dt.datetime.fromisoformat(generated_at.replace("Z", "+00:00")).timetuple()[:6]
+    entries = {"plan.json": plan_json}
+    if research_json:
+        entries["research.json"] = research_json
+    entries.update({
+        "launch_email.md": assets["launch_email"],
+        "social_posts.md": "\n\n".join(assets["social_posts"]),
+        "script_outline.md": assets["script_outline"],
+        "weekly_checklist.md": assets["weekly_checklist"],
+        "meta.txt": f"generated_at={generated_at}",
+    })
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name, data in entries.items():
+            info = zipfile.ZipInfo(name, date_time=stamp)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            z.writestr(info, data, compresslevel=1)
+    return buf.getvalue()
+
+def refresh_launch_pack():
+    """Rebuild the ZIP into session_state whenever plan/research/assets change.
+
+    The download button then reads the stored bytes, so plain reruns (e.g.
+    Deliver-form submits) neither rebuild nor copy the pack.
+    """
+    s = st.session_state
+    if not (s.plan and s.assets):
+        s.launch_pack_bytes = None
+        return
+    research_json = s.research.model_dump_json() if s.research else None
+    s.launch_pack_bytes = build_pack_zip(
+        s.plan.model_dump_json(), research_json, s.assets.model_dump(), s.assets_generated_at
+    )
 
-def build_ics_from_plan(plan: PlanOut, title_prefix="Milestone"):
+@st.cache_data(show_spinner=False)
+def build_ics_bytes(milestones: tuple[tuple[str, str], ...], title_prefix="Milestone") -> bytes | None:
+    """ICS for (title, due) pairs; cached so reruns skip date parsing and serialization."""
     if not ICS_AVAILABLE:
         return None
     cal = Calendar()
-    for i, m in enumerate(plan.milestones, 1):
+    for i, (title, due) in enumerate(milestones, 1):
         e = Event()
-        e.name = f"{title_prefix} {i}: {m.title}"
-        e.begin = f"{m.due} 09:00"   # naive time; editable after import
+        e.name = f"{title_prefix} {i}: {title}"
+        e.begin = f"{due} 09:00"   # naive time; editable after import
         e.make_all_day()
         cal.events.add(e)
     return str(cal).encode("utf-8")
@@ -187,56 +289,99 @@ clear_all    = b4.button("🧹 Reset")
 run_all      = b5.button("✨ Run all")
 
 if clear_all:
+    # UI state only: cached clients/chains (st.cache_resource) and responses survive the rerun
     st.session_state.research = None
     st.session_state.plan = None
     st.session_state.assets = None
     st.session_state.edit_mode = False
-    st.experimental_rerun()
+    st.session_state.launch_pack_bytes = None
+    if st.session_state.run_all_futures is not None:
+        for f in st.session_state.run_all_futures.values():
+            f.cancel()   # a pending Run all must not repopulate
+        st.session_state.run_all_futures = None
+    st.rerun()
 
 # ---------- Run All ----------
-if run_all:
+# Research and Plan are independent, so they run as concurrent futures on a shared
+# pool; Assets is submitted once both are done. The sync make_* calls are used so the
+# cached ChatGroq client is never shared across event loops.
+def _outcome(future):
+    """Result of a finished future, or the exception it raised."""
     try:
-        with st.spinner("Researching…"):
-            r = make_research(goal, audience, constraints)
-        if isinstance(r.risks, dict):
-            r.risks = [{"risk": k, "mitigation": v} for k, v in r.risks.items()]
+        return future.result()
+    except Exception as e:
+        return e
+
+@st.cache_resource(show_spinner=False)
+def executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=4)
+
+@st.fragment(run_every=0.5)
+def run_all_poller():
+    """Poll the background Run All; chain Assets, then hand results to a full rerun."""
+    futures = st.session_state.run_all_futures
+    if not all(f.done() for f in futures.values()):
+        stage = "producing assets" if "assets" in futures else "researching & planning"
+        st.info(f"⏳ Run all in progress — {stage}…")
+        return
+    r, p = _outcome(futures["research"]), _outcome(futures["plan"])
+    if "assets" not in futures and not isinstance(p, BaseException):
+        goal, audience, constraints = st.session_state.run_all_inputs
+        futures["assets"] = executor().submit(
+            make_assets, goal, audience, constraints,
+            plan=p,
+            research=None if isinstance(r, BaseException) else r
+        )
+        return
+    a = _outcome(futures["assets"]) if "assets" in futures else None
+    st.session_state.run_all_futures = None
+    st.session_state.run_all_result = (r, p, a)
+    st.rerun()
+
+if run_all and st.session_state.run_all_futures is None:
+    pool = executor()
+    st.session_state.run_all_futures = {
+        "research": pool.submit(make_research, goal, audience, constraints),
+        "plan": pool.submit(make_plan, goal, audience, constraints),
+    }
+    st.session_state.run_all_inputs = (goal, audience, constraints)
+
+if st.session_state.run_all_futures is not None:
+    run_all_poller()
+
+if "run_all_result" in st.session_state:
+    r, p, a = st.session_state.pop("run_all_result")
+
+    if isinstance(r, BaseException):
+        st.error("Research failed."); st.caption(str(r))
+    else:
         st.session_state.research = r
         st.success("Research ready ✅")
-    except Exception as e:
-        st.error("Research failed."); st.caption(str(e))
-
-    if st.session_state.research:
-        try:
-            with st.spinner("Planning…"):
-                p = make_plan(goal, audience, constraints)
-            if isinstance(p.risks, dict):
-                p.risks = [{"risk": k, "mitigation": v} for k, v in p.risks.items()]
-            st.session_state.plan = p
-            st.success("Plan ready ✅")
-        except Exception as e:
-            st.error("Plan failed."); st.caption(str(e))
-
-    if st.session_state.plan:
-        try:
-            with st.spinner("Producing assets…"):
-                a = make_assets(
-                    goal, audience, constraints,
-                    plan=st.session_state.plan,
-                    research=st.session_state.research
-                )
-            st.session_state.assets = a
-            st.success("Assets ready ✅")
-        except Exception as e:
-            st.error("Assets failed."); st.caption(str(e))
+
+    if isinstance(p, BaseException):
+        st.error("Plan failed."); st.caption(str(p))
+    else:
+        st.session_state.plan = p
+        st.success("Plan ready ✅")
+
+    if isinstance(a, BaseException):
+        st.error("Assets failed."); st.caption(str(a))
+    elif a is not None:
+        st.session_state.assets = a
+        st.session_state.assets_generated_at = utc_stamp()
+        st.success("Assets ready ✅")
+    refresh_launch_pack()
 
 # ---------- Step 1: Research ----------
 if run_research:
     try:
-        with st.spinner("Researching…"):
-            r: ResearchOut = make_research(goal, audience, constraints)
-        if isinstance(r.risks, dict):
-            r.risks = [{"risk": k, "mitigation": v} for k, v in r.risks.items()]
+        r = cached_research(goal, audience, constraints)
+        if r is None:
+            text = stream_json(stream_research(goal, audience, constraints),
+                               lambda d: render_insights(d.get("insights")))
+            r = finish_research(goal, audience, constraints, text)
         st.session_state.research = r
+        refresh_launch_pack()
         st.success("Research ready ✅")
     except Exception as e:
         st.error("Research failed. Please try again."); st.caption(str(e))
@@ -255,12 +400,13 @@ if st.session_state.research:
 # ---------- Step 2: Plan ----------
 if run_plan:
     try:
-        with st.spinner("Planning…"):
-            p: PlanOut = make_plan(goal, audience, constraints)
-        if isinstance(p.risks, dict):
-            p.risks = [{"risk": k, "mitigation": v} for k, v in p.risks.items()]
+        p = cached_plan(goal, audience, constraints)
+        if p is None:
+            text = stream_json(stream_plan(goal, audience, constraints), preview_milestones)
+            p = finish_plan(goal, audience, constraints, text)
         st.session_state.plan = p
         st.session_state.edit_mode = True
+        refresh_launch_pack()
         st.success("Plan ready ✅ — you can edit it below before producing assets.")
     except Exception as e:
         st.error("Plan failed. Please try again."); st.caption(str(e))
@@ -279,8 +425,10 @@ if st.session_state.plan:
                 new_milestones.append(Milestone(title=t, due=due, tasks=m.tasks))
         save = st.form_submit_button("💾 Save changes")
         if save:
+            # assets/calendar render below in this same run, so they pick up the edit
             p.milestones = new_milestones
             st.session_state.plan = p
+            refresh_launch_pack()
             st.success("Saved.")
 
     st.markdown("**✅ Success metrics**")
@@ -294,13 +442,15 @@ if run_assets:
         if not st.session_state.plan:
             st.warning("Run planning first.")
         else:
-            with st.spinner("Producing assets…"):
-                a: AssetsOut = make_assets(
-                    goal, audience, constraints,
-                    plan=st.session_state.plan,
-                    research=st.session_state.research
-                )
+            plan, research = st.session_state.plan, st.session_state.research
+            a = cached_assets(goal, audience, constraints, plan, research)
+            if a is None:
+                chunks = stream_assets(goal, audience, constraints, plan, research)
+                text = stream_json(chunks, lambda d: st.code(d.get("launch_email", ""), language="markdown"))
+                a = finish_assets(goal, audience, constraints, plan, research, text)
             st.session_state.assets = a
+            st.session_state.assets_generated_at = utc_stamp()
+            refresh_launch_pack()
             st.success("Assets ready ✅")
     except Exception as e:
         st.error("Asset generation failed. Please try again."); st.caption(str(e))
@@ -318,26 +468,17 @@ if st.session_state.assets:
     st.subheader("Weekly checklist");    st.code(a.weekly_checklist, language="markdown")
 
     # ---- ZIP + individual downloads ----
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
-        z.writestr("plan.json", st.session_state.plan.model_dump_json(indent=2))
-        if st.session_state.research:
-            z.writestr("research.json", st.session_state.research.model_dump_json(indent=2))
-        z.writestr("launch_email.md", a.launch_email)
-        z.writestr("social_posts.md", "\n\n".join(a.social_posts))
-        z.writestr("script_outline.md", a.script_outline)
-        z.writestr("weekly_checklist.md", a.weekly_checklist)
-        z.writestr("meta.txt", f"generated_at={dt.datetime.utcnow().isoformat()}Z")
-
-    st.download_button("⬇️ Download launch pack (.zip)", data=buf.getvalue(), file_name="action-planner-pack.zip")
-    st.download_button("Download plan.json", data=st.session_state.plan.model_dump_json(indent=2), file_name="plan.json")
+    # the pack is built when plan/research/assets change (refresh_launch_pack), not per rerun
+    if st.session_state.launch_pack_bytes is None:
+        refresh_launch_pack()
+    st.download_button("⬇️ Download launch pack (.zip)", data=st.session_state.launch_pack_bytes,
+                       file_name="action-planner-pack.zip")
+    st.download_button("Download plan.json", data=st.session_state.plan.model_dump_json(), file_name="plan.json")
 
 # ---------- 📤 Deliver ----------
-if st.session_state.assets and st.session_state.plan:
-    st.markdown("### 📤 Deliver")
-
-    a = st.session_state.assets
-
+@st.fragment
+def deliver_form(a: AssetsOut):
+    # fragment: submitting/downloading here reruns only this block, not the assets view
     # Prefill subject from first line if present
     default_subject = "Launch: Podcast"
     if a.launch_email:
@@ -356,39 +497,11 @@ if st.session_state.assets and st.session_state.plan:
             recipient_email = st.text_input("Recipient email", value="", placeholder="person@example.com")
         with colB:
             sender_name  = st.text_input("Your name (signature)", value="Action Planner")
-            sender_email = st.text_input("Sender email (for .eml/SMTP)", value=st.secrets.get("SMTP_USER", ""))
+            sender_email = st.text_input("Sender email (for .eml/SMTP)", value=smtp_cfg()["user"])
 
         confirm = st.checkbox("I confirm the recipient and content are correct.")
         submit  = st.form_submit_button("✉️ Send via SMTP (one click)")
 
-    # --- utilities
-    import re, ssl, smtplib
-    from email.message import EmailMessage
-    from urllib.parse import quote
-
-    def valid_email(x: str) -> bool:
-        return bool(re.match(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", x or ""))
-
-    def smtp_send(subject: str, body: str, sender: str, recipient: str) -> tuple[bool, str]:
-        host = os.getenv("SMTP_HOST", st.secrets.get("SMTP_HOST", ""))
-        port = int(os.getenv("SMTP_PORT", st.secrets.get("SMTP_PORT", "0") or "0"))
-        user = os.getenv("SMTP_USER", st.secrets.get("SMTP_USER", ""))
-        pw   = os.getenv("SMTP_PASS", st.secrets.get("SMTP_PASS", ""))
-        if not all([host, port, user, pw]):
-            return False, "SMTP not configured in secrets."
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = sender or user
-        msg["To"] = recipient
-        msg.set_content(body)
-        try:
-            with smtplib.SMTP_SSL(host, port, context=ssl.create_default_context()) as server:
-                server.login(user, pw)
-                server.send_message(msg)
-            return True, "Email sent ✅"
-        except Exception as e:
-            return False, f"Send failed: {e}"
-
     # --- actions
     if submit:
         # guardrails
@@ -399,29 +512,29 @@ if st.session_state.assets and st.session_state.plan:
         elif not valid_email(sender_email):
             st.error("Sender email looks invalid.")
         else:
-            ok, msg = smtp_send(email_subject, email_body, sender_email, recipient_email)
+            ok, msg = smtp_send(smtp_cfg(), email_subject, email_body, sender_email, recipient_email)
             (st.success if ok else st.error)(msg)
 
     # Always show mailto + .eml fallback
-    from urllib.parse import quote
-    mailto = f"mailto:{quote(recipient_email or '')}?subject={quote(email_subject)}&body={quote(email_body)}"
+    mailto = build_mailto_link(recipient_email or "", email_subject, email_body)
     c1, c2 = st.columns(2)
     with c1:
         st.markdown(f"[📧 Open in Mail app (mailto)]({mailto})")
     with c2:
-        # Build .eml bytes
-        m = EmailMessage(); m["Subject"]=email_subject; m["From"]=sender_email or "me@example.com"; m["To"]=recipient_email or "you@example.com"; m.set_content(email_body)
-        st.download_button("⬇️ Download .eml", data=m.as_bytes(), file_name="launch-email.eml")
+        eml = build_eml_bytes(email_subject, email_body, sender_email, recipient_email)
+        st.download_button("⬇️ Download .eml", data=eml, file_name="launch-email.eml")
+
+if st.session_state.assets and st.session_state.plan:
+    st.markdown("### 📤 Deliver")
+    deliver_form(st.session_state.assets)
 
-    # Optional calendar export (requires 'ics' in requirements)
+    # Optional calendar export (requires 'ics' in requirements); depends on the plan only
+    ics_bytes = None
     try:
-        from ics import Calendar, Event
-        cal = Calendar()
-        for i, m in enumerate(st.session_state.plan.milestones, 1):
-            ev = Event()
-            ev.name = f"Milestone {i}: {m.title}"
-            ev.begin = f"{m.due} 09:00"; ev.make_all_day()
-            cal.events.add(ev)
-        st.download_button("📆 Download milestones.ics", data=str(cal).encode("utf-8"), file_name="milestones.ics")
+        ics_bytes = build_ics_bytes(tuple((m.title, m.due) for m in st.session_state.plan.milestones))
     except Exception:
+        pass
+    if ics_bytes:
+        st.download_button("📆 Download milestones.ics", data=ics_bytes, file_name="milestones.ics")
+    else:
         st.caption("Install `ics` in requirements.txt to enable calendar export.")
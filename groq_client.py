@@ -0,0 +1,110 @@
+# groq_client.py — ChatGroq clients and JSON-mode chains, built once per (model, temperature,
+# max_tokens[, schema]) and shared across reruns
+
+import os
+from typing import Iterator, Optional
+import streamlit as st
+from pydantic import TypeAdapter, ValidationError
+from langchain_groq import ChatGroq
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.utils.json import parse_json_markdown
+from response_cache import cache_key, lookup, save
+from semantic_cache import semantic_lookup, semantic_save
+
+DEFAULT_MODEL = "llama-3.1-70b-versatile"
+
+def current_model() -> str:
+    # read at call time so the sidebar model switch takes effect immediately
+    return os.getenv("GROQ_MODEL", DEFAULT_MODEL)
+
+@st.cache_resource(show_spinner=False)
+def get_llm(model: str, temperature: float, max_tokens: int) -> ChatGroq:
+    # Streamlit secrets are copied into env by app.py before any agent call;
+    # max_tokens is sized per schema so a runaway answer can't inflate decode time
+    return ChatGroq(
+        api_key=os.getenv("GROQ_API_KEY"),
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+
+# Schema instructions go in the prompt: JSON mode constrains decoding to valid JSON
+# but (unlike tool calling) doesn't pass the schema itself.
+def with_format_instructions(prompt: ChatPromptTemplate, schema) -> ChatPromptTemplate:
+    parser = JsonOutputParser(pydantic_object=schema)
+    return (
+        prompt + ChatPromptTemplate.from_messages([("system", "{format_instructions}")])
+    ).partial(format_instructions=parser.get_format_instructions())
+
+# One chain per (model, settings, schema); each agent has its own schema, so the
+# prompt (`_prompt`, unhashed) is implied by it and the instructions are derived once.
+@st.cache_resource(show_spinner=False)
+def get_chain(model: str, temperature: float, max_tokens: int, schema, _prompt: ChatPromptTemplate):
+    llm = get_llm(model, temperature, max_tokens)
+    return _prompt | llm.with_structured_output(schema, method="json_mode", include_raw=True)
+
+# Streaming path: same prompt and JSON mode, raw text chunks, parsed once complete
+@st.cache_resource(show_spinner=False)
+def get_stream_chain(model: str, temperature: float, max_tokens: int, schema, _prompt: ChatPromptTemplate):
+    llm = get_llm(model, temperature, max_tokens)
+    return _prompt | llm.bind(response_format={"type": "json_object"})
+
+def parse_structured(result: dict, adapter: TypeAdapter):
+    """Unpack a with_structured_output(include_raw=True) result.
+
+    If LangChain's own parse failed, try the raw message text (JSON mode puts
+    the answer there, not in tool calls) with the module's prebuilt TypeAdapter before giving up, so a slightly
+    malformed response doesn't cost another LLM round-trip. Agents build their
+    adapter once at import, so this fallback never recompiles the schema.
+    """
+    if result["parsed"] is not None:
+        return result["parsed"]
+    raw = result["raw"]
+    error = None
+    content = getattr(raw, "content", None)
+    if isinstance(content, str) and content.strip():
+        try:
+            return adapter.validate_json(content)
+        except ValidationError as e:
+            error = e
+    # a ValidationError lets callers fall through to their STRICT JSON retry
+    raise error or result["parsing_error"] or ValueError("Model returned no structured output.")
+
+
+# ---------- Shared agent plumbing (kind = "research" | "plan" | "assets") ----------
+def invoke_json(chain, payload: dict, adapter: TypeAdapter):
+    """Invoke a get_chain chain; one STRICT JSON retry if the answer fails validation."""
+    try:
+        return parse_structured(chain.invoke(payload), adapter)
+    except ValidationError:
+        retry = dict(payload, constraints=f"{payload['constraints']} STRICT JSON ONLY.")
+        return parse_structured(chain.invoke(retry), adapter)
+
+def recall(kind: str, model: str, payload: dict, query: Optional[str] = None) -> Optional[str]:
+    """Exact key first, then (if `query` is given) a reworded match via embedding similarity."""
+    key = cache_key(kind, model, payload)
+    cached = lookup(key)
+    if cached is None and query is not None:
+        cached = semantic_lookup(kind, model, query)
+        if cached is not None:
+            save(key, cached)   # next time it's an exact hit
+    return cached
+
+def remember(kind: str, model: str, payload: dict, out: str, query: Optional[str] = None) -> None:
+    save(cache_key(kind, model, payload), out)
+    if query is not None:
+        semantic_save(kind, model, query, out)
+
+def stream_text(chain, payload: dict) -> Iterator[str]:
+    """Yield raw JSON chunks from a get_stream_chain chain as the LLM generates them."""
+    for chunk in chain.stream(payload):
+        yield chunk.content
+
+def parse_streamed(text: str, adapter: TypeAdapter, chain, payload: dict):
+    """Validate streamed JSON; if malformed, one unstreamed STRICT JSON retry through `chain`."""
+    try:
+        return adapter.validate_python(parse_json_markdown(text))
+    except ValueError:   # malformed JSON or schema mismatch (ValidationError)
+        retry = dict(payload, constraints=f"{payload['constraints']} STRICT JSON ONLY.")
+        return parse_structured(chain.invoke(retry), adapter)
@@ -1,21 +1,16 @@
-import os
-from typing import Optional
-from pydantic import ValidationError
-from langchain_groq import ChatGroq
+from typing import Iterator, Optional
+import streamlit as st
+from pydantic import TypeAdapter
 from langchain_core.prompts import ChatPromptTemplate
 from schemas import PlanOut
+from groq_client import (current_model, get_chain, get_stream_chain, with_format_instructions,
+                         invoke_json, recall, remember, stream_text, parse_streamed)
+from response_cache import TTL_SECONDS
+from semantic_cache import query_text
 
-# Streamlit exposes secrets via st.secrets, but we also fall back to env
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_MODEL   = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
-
-llm = ChatGroq(
-    api_key=GROQ_API_KEY,
-    model=GROQ_MODEL,
-    temperature=0.2,   # stable outputs
-)
-
-structured_llm = llm.with_structured_output(PlanOut)
+PLAN_ADAPTER = TypeAdapter(PlanOut)
+MAX_TOKENS = 1024
+TEMPERATURE = 0.2   # stable outputs
 
 prompt = ChatPromptTemplate.from_messages([
     ("system",
@@ -32,19 +27,65 @@ prompt = ChatPromptTemplate.from_messages([
     )
 ])
 
-planner_chain = prompt | structured_llm
+json_prompt = with_format_instructions(prompt, PlanOut)
 
-def make_plan(goal: str,
-              audience: Optional[str] = None,
-              constraints: Optional[str] = None) -> PlanOut:
-    """Generate a validated plan. Retries once if JSON fails."""
-    payload = {
+def _chain(model: str):
+    return get_chain(model, TEMPERATURE, MAX_TOKENS, PlanOut, json_prompt)
+
+def _stream_chain(model: str):
+    return get_stream_chain(model, TEMPERATURE, MAX_TOKENS, PlanOut, json_prompt)
+
+def _payload(goal: str,
+             audience: Optional[str],
+             constraints: Optional[str]) -> dict:
+    return {
         "goal": goal,
         "audience": audience or "general",
         "constraints": constraints or "keep budget low"
     }
-    try:
-        return planner_chain.invoke(payload)
-    except ValidationError:
-        payload["constraints"] += " STRICT JSON ONLY."
-        return planner_chain.invoke(payload)
+
+@st.cache_data(ttl=TTL_SECONDS, show_spinner=False)
+def _plan_json(goal: str,
+               audience: Optional[str],
+               constraints: Optional[str],
+               model: str) -> str:
+    # JSON string keeps the cached value hashable/picklable; model in the signature
+    # makes a sidebar model switch a cache miss.
+    payload = _payload(goal, audience, constraints)
+    query = query_text(goal, audience, constraints)
+    out = recall("plan", model, payload, query)
+    if out is None:
+        out = invoke_json(_chain(model), payload, PLAN_ADAPTER).model_dump_json()
+        remember("plan", model, payload, out, query)
+    return out
+
+def make_plan(goal: str,
+              audience: Optional[str] = None,
+              constraints: Optional[str] = None) -> PlanOut:
+    """Generate a validated plan. Retries once if JSON fails; cached per (inputs, model)."""
+    return PlanOut.model_validate_json(_plan_json(goal, audience, constraints, current_model()))
+
+def cached_plan(goal: str,
+                audience: Optional[str] = None,
+                constraints: Optional[str] = None) -> Optional[PlanOut]:
+    """The cached plan for these inputs (exact or reworded), or None on a miss."""
+    out = recall("plan", current_model(), _payload(goal, audience, constraints),
+                 query_text(goal, audience, constraints))
+    return None if out is None else PlanOut.model_validate_json(out)
+
+def stream_plan(goal: str,
+                audience: Optional[str] = None,
+                constraints: Optional[str] = None) -> Iterator[str]:
+    # live preview for a cached_plan miss; hand the joined text to finish_plan
+    return stream_text(_stream_chain(current_model()), _payload(goal, audience, constraints))
+
+def finish_plan(goal: str,
+                audience: Optional[str],
+                constraints: Optional[str],
+                text: str) -> PlanOut:
+    """Validate the streamed plan and cache it like make_plan would."""
+    model = current_model()
+    payload = _payload(goal, audience, constraints)
+    result = parse_streamed(text, PLAN_ADAPTER, _chain(model), payload)
+    remember("plan", model, payload, result.model_dump_json(), query_text(goal, audience, constraints))
+    return result
@@ -1,15 +1,15 @@
-import os
-from typing import Optional
-from pydantic import ValidationError
-from langchain_groq import ChatGroq
+from typing import Iterator, Optional
+import streamlit as st
+from pydantic import TypeAdapter
 from langchain_core.prompts import ChatPromptTemplate
 from schemas import AssetsOut, PlanOut, ResearchOut
+from groq_client import (current_model, get_chain, get_stream_chain, with_format_instructions,
+                         invoke_json, recall, remember, stream_text, parse_streamed)
+from response_cache import TTL_SECONDS
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_MODEL   = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
-
-llm = ChatGroq(api_key=GROQ_API_KEY, model=GROQ_MODEL, temperature=0.3)
-structured_llm = llm.with_structured_output(AssetsOut)
+ASSETS_ADAPTER = TypeAdapter(AssetsOut)
+MAX_TOKENS = 2048
+TEMPERATURE = 0.3
 
 prompt = ChatPromptTemplate.from_messages([
     ("system",
@@ -27,33 +27,96 @@ prompt = ChatPromptTemplate.from_messages([
     )
 ])
 
-def make_assets(goal: str,
-                audience: Optional[str],
-                constraints: Optional[str],
-                plan: PlanOut,
-                research: Optional[ResearchOut] = None) -> AssetsOut:
+json_prompt = with_format_instructions(prompt, AssetsOut)
+
+def _chain(model: str):
+    return get_chain(model, TEMPERATURE, MAX_TOKENS, AssetsOut, json_prompt)
+
+def _stream_chain(model: str):
+    return get_stream_chain(model, TEMPERATURE, MAX_TOKENS, AssetsOut, json_prompt)
+
+SUMMARY_FIELD_CHARS = 200
+
+def _clip(text: str, limit: int = SUMMARY_FIELD_CHARS) -> str:
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+def _research_summary(research: Optional[ResearchOut]) -> str:
     # small summary string to help Producer ground content
-    research_summary = ""
-    if research:
-        # normalize research risks (they may be dict)
-        rrisks = research.risks
-        if isinstance(rrisks, dict):
-            rrisks = [{"risk": k, "mitigation": v} for k, v in rrisks.items()]
-        research_summary = (
-            f"targets={ [t.name for t in research.targets] }\n"
-            f"insights_top3={ research.insights[:3] }\n"
-            f"risks_top2={ [r['risk'] for r in rrisks[:2]] }"
-        )
-
-    payload = dict(
+    if not research:
+        return ""
+    # plain comma-joined text (no list reprs/quotes) keeps prompt tokens down
+    return (
+        "targets=" + _clip(", ".join(t.name for t in research.targets)) + "\n"
+        "insights_top3=" + _clip("; ".join(research.insights[:3])) + "\n"
+        "risks_top2=" + _clip("; ".join(r.get("risk", "") for r in research.risks[:2]))
+    )
+
+def _payload(goal: str,
+             audience: Optional[str],
+             constraints: Optional[str],
+             plan_json: str,
+             research_summary: str) -> dict:
+    return dict(
         goal=goal,
         audience=audience or "general",
         constraints=constraints or "concise, friendly",
-        plan_json=plan.model_dump_json(),
+        plan_json=plan_json,
         research_summary=research_summary
     )
-    try:
-        return (prompt | structured_llm).invoke(payload)
-    except ValidationError:
-        payload["constraints"] += " STRICT JSON ONLY."
-        return (prompt | structured_llm).invoke(payload)
+
+@st.cache_data(ttl=TTL_SECONDS, show_spinner=False)
+def _assets_json(goal: str,
+                 audience: Optional[str],
+                 constraints: Optional[str],
+                 plan_json: str,
+                 research_summary: str,
+                 model: str) -> str:
+    # exact cache only: assets depend on the whole plan, so a reworded goal isn't a match
+    payload = _payload(goal, audience, constraints, plan_json, research_summary)
+    out = recall("assets", model, payload)
+    if out is None:
+        out = invoke_json(_chain(model), payload, ASSETS_ADAPTER).model_dump_json()
+        remember("assets", model, payload, out)
+    return out
+
+def make_assets(goal: str,
+                audience: Optional[str],
+                constraints: Optional[str],
+                plan: PlanOut,
+                research: Optional[ResearchOut] = None) -> AssetsOut:
+    return AssetsOut.model_validate_json(_assets_json(
+        goal, audience, constraints,
+        plan.model_dump_json(), _research_summary(research), current_model()
+    ))
+
+def cached_assets(goal: str,
+                  audience: Optional[str],
+                  constraints: Optional[str],
+                  plan: PlanOut,
+                  research: Optional[ResearchOut] = None) -> Optional[AssetsOut]:
+    """The cached assets for exactly these inputs, or None on a miss."""
+    payload = _payload(goal, audience, constraints, plan.model_dump_json(), _research_summary(research))
+    out = recall("assets", current_model(), payload)
+    return None if out is None else AssetsOut.model_validate_json(out)
+
+def stream_assets(goal: str,
+                  audience: Optional[str],
+                  constraints: Optional[str],
+                  plan: PlanOut,
+                  research: Optional[ResearchOut] = None) -> Iterator[str]:
+    # live preview for a cached_assets miss; hand the joined text to finish_assets
+    payload = _payload(goal, audience, constraints, plan.model_dump_json(), _research_summary(research))
+    return stream_text(_stream_chain(current_model()), payload)
+
+def finish_assets(goal: str,
+                  audience: Optional[str],
+                  constraints: Optional[str],
+                  plan: PlanOut,
+                  research: Optional[ResearchOut],
+                  text: str) -> AssetsOut:
+    """Validate the streamed assets and cache them like make_assets would."""
+    model = current_model()
+    payload = _payload(goal, audience, constraints, plan.model_dump_json(), _research_summary(research))
+    result = parse_streamed(text, ASSETS_ADAPTER, _chain(model), payload)
+    remember("assets", model, payload, result.model_dump_json())
+    return result
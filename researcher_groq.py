@@ -1,19 +1,16 @@
-import os
-from typing import Optional
-from pydantic import ValidationError
-from langchain_groq import ChatGroq
+from typing import Iterator, Optional
+import streamlit as st
+from pydantic import TypeAdapter
 from langchain_core.prompts import ChatPromptTemplate
 from schemas import ResearchOut
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
-from schemas import ResearchOut
-
+from groq_client import (current_model, get_chain, get_stream_chain, with_format_instructions,
+                         invoke_json, recall, remember, stream_text, parse_streamed)
+from response_cache import TTL_SECONDS
+from semantic_cache import query_text
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_MODEL   = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
-
-llm = ChatGroq(api_key=GROQ_API_KEY, model=GROQ_MODEL, temperature=0.2)
-structured_llm = llm.with_structured_output(ResearchOut)
+RESEARCH_ADAPTER = TypeAdapter(ResearchOut)
+MAX_TOKENS = 1500
+TEMPERATURE = 0
 
 prompt = ChatPromptTemplate.from_messages([
     ("system",
@@ -21,24 +18,60 @@ prompt = ChatPromptTemplate.from_messages([
     ("user",
      "Goal: {goal}\nAudience: {audience}\nConstraints: {constraints}\n\n"
      "Return JSON with:\n"
-     "- targets: [{name, why}] (2–4)\n"
+     "- targets: [{{name, why}}] (2–4)\n"
      "- insights: [string] (5–8 concise points)\n"
      "- risks: array of objects with keys 'risk' and 'mitigation' (2–4)\n"
-     "- references: [{title, url}] (3–5; trustworthy sources)\n"
+     "- references: [{{title, url}}] (3–5; trustworthy sources)\n"
      "Return JSON only."
     )
 ])
 
-research_chain = prompt | structured_llm
+json_prompt = with_format_instructions(prompt, ResearchOut)
+
+
+def _chain(model: str):
+    return get_chain(model, TEMPERATURE, MAX_TOKENS, ResearchOut, json_prompt)
+
+
+def _stream_chain(model: str):
+    return get_stream_chain(model, TEMPERATURE, MAX_TOKENS, ResearchOut, json_prompt)
+
+
+def _payload(goal: str, audience: str, constraints: str) -> dict:
+    return {"goal": goal, "audience": audience, "constraints": constraints}
+
+
+@st.cache_data(ttl=TTL_SECONDS, show_spinner=False)
+def _research_json(goal: str, audience: str, constraints: str, model: str) -> str:
+    payload = _payload(goal, audience, constraints)
+    query = query_text(goal, audience, constraints)
+    out = recall("research", model, payload, query)
+    if out is None:
+        out = invoke_json(_chain(model), payload, RESEARCH_ADAPTER).model_dump_json()
+        remember("research", model, payload, out, query)
+    return out
 
 
 def make_research(goal: str, audience: str, constraints: str) -> ResearchOut:
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a helpful research assistant. "
-                   "Analyze the project idea and provide targets, insights, risks, and references."),
-        ("human", "Goal: {goal}\nAudience: {audience}\nConstraints: {constraints}")
-    ])
-
-    llm = ChatGroq(model=os.getenv("GROQ_MODEL"), temperature=0)
-    chain = prompt | llm.with_structured_output(ResearchOut)
-    return chain.invoke({"goal": goal, "audience": audience, "constraints": constraints})
\ No newline at end of file
+    return ResearchOut.model_validate_json(_research_json(goal, audience, constraints, current_model()))
+
+
+def cached_research(goal: str, audience: str, constraints: str) -> Optional[ResearchOut]:
+    """The cached research for these inputs (exact or reworded), or None on a miss."""
+    out = recall("research", current_model(), _payload(goal, audience, constraints),
+                 query_text(goal, audience, constraints))
+    return None if out is None else ResearchOut.model_validate_json(out)
+
+
+def stream_research(goal: str, audience: str, constraints: str) -> Iterator[str]:
+    # live preview for a cached_research miss; hand the joined text to finish_research
+    return stream_text(_stream_chain(current_model()), _payload(goal, audience, constraints))
+
+
+def finish_research(goal: str, audience: str, constraints: str, text: str) -> ResearchOut:
+    """Validate the streamed research and cache it like make_research would."""
+    model = current_model()
+    payload = _payload(goal, audience, constraints)
+    result = parse_streamed(text, RESEARCH_ADAPTER, _chain(model), payload)
+    remember("research", model, payload, result.model_dump_json(), query_text(goal, audience, constraints))
+    return result
@@ -0,0 +1,38 @@
+# response_cache.py — cross-session cache for LLM responses (JSON strings keyed by SHA256)
+
+import os, json, hashlib
+from typing import Optional
+import streamlit as st
+
+CACHE_DIR = os.path.expanduser("~/.cache/action-planner")
+TTL_SECONDS = 24 * 60 * 60
+
+# diskcache is optional; without it we fall back to an in-process dict
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except Exception:
+    diskcache = None
+    DISKCACHE_AVAILABLE = False
+
+
+@st.cache_resource(show_spinner=False)
+def _store():
+    if DISKCACHE_AVAILABLE:
+        return diskcache.Cache(os.path.join(CACHE_DIR, "responses"))
+    return {}
+
+def cache_key(kind: str, model: str, payload: dict) -> str:
+    """Stable key for one agent call: which agent, which model, which inputs."""
+    blob = json.dumps({"kind": kind, "model": model, "payload": payload}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def lookup(key: str) -> Optional[str]:
+    return _store().get(key)
+
+def save(key: str, value: str) -> None:
+    store = _store()
+    if DISKCACHE_AVAILABLE:
+        store.set(key, value, expire=TTL_SECONDS)
+    else:
+        store[key] = value
@@ -1,5 +1,11 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Union
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Dict
+
+def _risks_as_list(v):
+    # models sometimes return {"risk": "mitigation", ...}; normalize to the list form
+    if isinstance(v, dict):
+        return [{"risk": k, "mitigation": m} for k, m in v.items()]
+    return v
 
 # ---------- Planner ----------
 class TaskItem(BaseModel):
@@ -15,8 +21,9 @@ class Milestone(BaseModel):
 class PlanOut(BaseModel):
     milestones: List[Milestone]
     success_metrics: List[str]
-    # accept list OR dict then normalize in UI
-    risks: Union[List[Dict[str, str]], Dict[str, str]]
+    risks: List[Dict[str, str]]   # a dict is accepted and coerced to this
+
+    _coerce_risks = field_validator("risks", mode="before")(_risks_as_list)
 
 # ---------- Researcher ----------
 class Target(BaseModel):
@@ -30,10 +37,11 @@ class Reference(BaseModel):
 class ResearchOut(BaseModel):
     targets: List[Target]
     insights: List[str]
-    # accept list OR dict; normalize in UI
-    risks: Union[List[Dict[str, str]], Dict[str, str]]
+    risks: List[Dict[str, str]]   # a dict is accepted and coerced to this
     references: List[Reference]
 
+    _coerce_risks = field_validator("risks", mode="before")(_risks_as_list)
+
 # ---------- Producer ----------
 class AssetsOut(BaseModel):
     launch_email: str
@@ -0,0 +1,146 @@
+# semantic_cache.py — near-duplicate lookup for reworded goals/constraints
+#
+# Three parts: an embeddings manager (cached MiniLM model), a similarity
+# calculator (inner product over normalized vectors == cosine), and a cache
+# manager (one FAISS index + parallel result JSON / timestamps per agent/model,
+# capped, expired with the exact cache's TTL, persisted on a debounce under
+# ~/.cache/action-planner/semantic).
+
+import os, json, time, atexit, hashlib, threading
+from typing import Optional
+import streamlit as st
+from response_cache import CACHE_DIR, TTL_SECONDS
+
+EMBED_MODEL = "all-MiniLM-L6-v2"
+THRESHOLD = 0.92
+MAX_ENTRIES = 1000          # per (agent, model); oldest ~10% evicted when full
+PERSIST_INTERVAL_S = 30     # write index/results at most this often (plus at exit)
+INDEX_DIR = os.path.join(CACHE_DIR, "semantic")
+
+# sentence-transformers + faiss are optional; without them every lookup misses
+try:
+    import numpy as np
+    import faiss
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_AVAILABLE = True
+except Exception:
+    np = faiss = SentenceTransformer = None
+    SEMANTIC_AVAILABLE = False
+
+
+# ---------- Embeddings manager ----------
+@st.cache_resource(show_spinner=False)
+def _embedder():
+    return SentenceTransformer(EMBED_MODEL)
+
+def query_text(goal: str, audience: Optional[str], constraints: Optional[str]) -> str:
+    return f"Goal: {goal}\nAudience: {audience or ''}\nConstraints: {constraints or ''}"
+
+def embed(text: str):
+    vec = _embedder().encode([text], normalize_embeddings=True)
+    return np.asarray(vec, dtype="float32")
+
+
+# ---------- Similarity calculator ----------
+def best_match(index, vec) -> tuple[float, int]:
+    """Top-1 cosine similarity (vectors are L2-normalized, so IP == cosine)."""
+    if index.ntotal == 0:
+        return 0.0, -1
+    scores, ids = index.search(vec, 1)
+    return float(scores[0][0]), int(ids[0][0])
+
+
+# ---------- Cache manager ----------
+class _Namespace:
+    """FAISS index + parallel results/timestamps for one (agent, model) pair."""
+
+    def __init__(self, kind: str, model: str):
+        slug = hashlib.sha256(f"{kind}:{model}".encode("utf-8")).hexdigest()[:16]
+        self.index_path = os.path.join(INDEX_DIR, f"{kind}-{slug}.faiss")
+        self.results_path = os.path.join(INDEX_DIR, f"{kind}-{slug}.json")
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_persist = time.monotonic()
+        self.index, self.results, self.saved_at = self._load()
+        self._prune()
+        atexit.register(self.flush)
+
+    def _load(self):
+        if os.path.exists(self.index_path) and os.path.exists(self.results_path):
+            index = faiss.read_index(self.index_path)
+            with open(self.results_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            # anything that doesn't line up with the index (e.g. an older format) starts fresh
+            if isinstance(meta, dict) and index.ntotal == len(meta["results"]) == len(meta["saved_at"]):
+                return index, meta["results"], meta["saved_at"]
+        dim = _embedder().get_sentence_embedding_dimension()
+        return faiss.IndexFlatIP(dim), [], []
+
+    def expired(self, idx: int) -> bool:
+        return time.time() - self.saved_at[idx] > TTL_SECONDS
+
+    def _prune(self):
+        """Drop expired entries and, when full, the oldest ones; rebuilds the index (O(n))."""
+        keep = [i for i in range(len(self.results)) if not self.expired(i)]
+        if len(keep) >= MAX_ENTRIES:
+            keep = sorted(keep, key=self.saved_at.__getitem__)[-(MAX_ENTRIES * 9 // 10):]
+            keep.sort()
+        if len(keep) == len(self.results):
+            return
+        vecs = self.index.reconstruct_n(0, self.index.ntotal)[keep] if keep else None
+        self.index.reset()
+        if vecs is not None:
+            self.index.add(vecs)
+        self.results = [self.results[i] for i in keep]
+        self.saved_at = [self.saved_at[i] for i in keep]
+        self.dirty = True
+
+    def add(self, vec, result_json: str):
+        if len(self.results) + 1 > MAX_ENTRIES or (self.saved_at and self.expired(0)):
+            self._prune()   # batch eviction, so most adds stay O(1)
+        self.index.add(vec)
+        self.results.append(result_json)
+        self.saved_at.append(time.time())
+        self.dirty = True
+        if time.monotonic() - self.last_persist >= PERSIST_INTERVAL_S:
+            self.persist()
+
+    def persist(self):
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        faiss.write_index(self.index, self.index_path)
+        with open(self.results_path, "w", encoding="utf-8") as f:
+            json.dump({"results": self.results, "saved_at": self.saved_at}, f)
+        self.dirty = False
+        self.last_persist = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self.persist()
+
+@st.cache_resource(show_spinner=False)
+def _namespace(kind: str, model: str) -> _Namespace:
+    return _Namespace(kind, model)
+
+def semantic_lookup(kind: str, model: str, text: str) -> Optional[str]:
+    """Return the cached result JSON for a paraphrase of `text`, if any."""
+    if not SEMANTIC_AVAILABLE:
+        return None
+    ns = _namespace(kind, model)
+    vec = embed(text)
+    with ns.lock:
+        score, idx = best_match(ns.index, vec)
+        if idx >= 0 and score > THRESHOLD and not ns.expired(idx):
+            return ns.results[idx]
+    return None
+
+def semantic_save(kind: str, model: str, text: str, result_json: str) -> None:
+    if not SEMANTIC_AVAILABLE:
+        return
+    ns = _namespace(kind, model)
+    vec = embed(text)
+    with ns.lock:
+        score, idx = best_match(ns.index, vec)
+        if idx >= 0 and score > THRESHOLD and not ns.expired(idx):
+            return   # already covered by a live near-duplicate
+        ns.add(vec, result_json)